@@ -0,0 +1,189 @@
+"""
+Асинхронный клиент S3 на aioboto3: список объектов и параллельное скачивание
+без пула потоков. Требует отдельной установки: pip install aioboto3
+"""
+
+import asyncio
+import logging
+import os
+from pathlib import Path
+from typing import Optional
+
+import aioboto3
+from aiobotocore.config import AioConfig
+from boto3.s3.transfer import TransferConfig
+from botocore.exceptions import ClientError
+
+from s3_client import (
+    CONNECT_TIMEOUT,
+    DEFAULT_MAX_CONCURRENCY,
+    DEFAULT_MAX_POOL_CONNECTIONS,
+    DEFAULT_REGION,
+    MULTIPART_CHUNKSIZE,
+    MULTIPART_THRESHOLD,
+    READ_TIMEOUT,
+    RETRIES,
+    S3Object,
+    _check_unique_names,
+    _env_defaults,
+    _page_objects,
+    get_logger,
+)
+
+
+class AsyncS3Client:
+    """
+    Асинхронный аналог S3Client. Используется как async context manager:
+
+        async with AsyncS3Client(bucket) as client:
+            objects = await client.list_objects(prefix="uploads/")
+            await client.download_many([o.Key for o in objects], "./downloads")
+    """
+
+    def __init__(
+        self,
+        bucket: str,
+        region_name: Optional[str] = None,
+        aws_access_key_id: Optional[str] = None,
+        aws_secret_access_key: Optional[str] = None,
+        endpoint_url: Optional[str] = None,
+        logger: Optional[logging.Logger] = None,
+        max_concurrency: int = DEFAULT_MAX_CONCURRENCY,
+        max_pool_connections: int = DEFAULT_MAX_POOL_CONNECTIONS,
+    ):
+        self.bucket = bucket
+        self.log = logger or get_logger()
+        self.max_concurrency = max_concurrency
+
+        env = _env_defaults()
+        self.region_name = region_name or env["AWS_REGION"] or DEFAULT_REGION
+        aws_access_key_id = aws_access_key_id or env["AWS_ACCESS_KEY_ID"]
+        aws_secret_access_key = aws_secret_access_key or env["AWS_SECRET_ACCESS_KEY"]
+        endpoint_url = endpoint_url or env["AWS_ENDPOINT_URL"]
+
+        session_kwargs = {"region_name": self.region_name}
+        if aws_access_key_id and aws_secret_access_key:
+            session_kwargs["aws_access_key_id"] = aws_access_key_id
+            session_kwargs["aws_secret_access_key"] = aws_secret_access_key
+        self._session = aioboto3.Session(**session_kwargs)
+
+        self._client_kwargs = {
+            "config": AioConfig(
+                max_pool_connections=max(max_pool_connections, max_concurrency),
+                retries=RETRIES,
+                tcp_keepalive=True,
+                connect_timeout=CONNECT_TIMEOUT,
+                read_timeout=READ_TIMEOUT,
+            )
+        }
+        if endpoint_url:
+            self._client_kwargs["endpoint_url"] = endpoint_url
+
+        # Крупные объекты качаются параллельными byte-range GET запросами
+        self._transfer_config = TransferConfig(
+            multipart_threshold=MULTIPART_THRESHOLD,
+            multipart_chunksize=MULTIPART_CHUNKSIZE,
+            max_concurrency=max_concurrency,
+        )
+
+        self._client_cm = None
+        self._client = None
+
+    async def __aenter__(self) -> "AsyncS3Client":
+        self._client_cm = self._session.client("s3", **self._client_kwargs)
+        self._client = await self._client_cm.__aenter__()
+        self.log.info(
+            "Async S3 клиент инициализирован: bucket=%s, region=%s", self.bucket, self.region_name
+        )
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb) -> None:
+        await self._client_cm.__aexit__(exc_type, exc, tb)
+        self._client_cm = None
+        self._client = None
+
+    async def list_objects(
+        self,
+        prefix: str = "",
+        max_keys: int = 1000,
+        delimiter: Optional[str] = None,
+        as_dict: bool = False,
+    ) -> list[S3Object | dict]:
+        """
+        Список объектов в бакете (с опциональным префиксом), не более max_keys записей.
+        Возвращает список S3Object; при as_dict=True — список словарей.
+        """
+        if self.log.isEnabledFor(logging.DEBUG):
+            self.log.debug("list_objects: prefix=%r, max_keys=%s", prefix, max_keys)
+        try:
+            paginator = self._client.get_paginator("list_objects_v2")
+            result = []
+            async for page in paginator.paginate(
+                Bucket=self.bucket,
+                Prefix=prefix,
+                Delimiter=delimiter or "",
+                PaginationConfig={"MaxItems": max_keys, "PageSize": min(max_keys, 1000)},
+            ):
+                result.extend(_page_objects(page.get("Contents", ())))
+            if as_dict:
+                result = [obj._asdict() for obj in result]
+            self.log.info("list_objects: получено записей=%s (prefix=%r)", len(result), prefix)
+            return result
+        except ClientError as e:
+            self.log.exception("list_objects ошибка: %s", e)
+            raise
+
+    async def download_file(self, key: str, local_dir: str | Path = ".") -> Path:
+        """
+        Скачивает объект в local_dir под именем ключа (через временный .part).
+        Операции с файловой системой выполняются в потоке, чтобы не блокировать event loop.
+        """
+        local_path = Path(local_dir) / Path(key).name
+        await asyncio.to_thread(local_path.parent.mkdir, parents=True, exist_ok=True)
+        self.log.info("download_file: key=%s -> %s", key, local_path)
+
+        tmp_path = local_path.with_name(local_path.name + ".part")
+        try:
+            await self._client.download_file(
+                self.bucket, key, str(tmp_path), Config=self._transfer_config
+            )
+            await asyncio.to_thread(os.replace, tmp_path, local_path)
+            size = (await asyncio.to_thread(local_path.stat)).st_size
+            self.log.info("download_file: успешно, размер=%s bytes", size)
+            return local_path
+        except ClientError as e:
+            self.log.exception("download_file ошибка: key=%s, error=%s", key, e)
+            raise
+        finally:
+            await asyncio.to_thread(tmp_path.unlink, missing_ok=True)
+
+    async def download_many(
+        self,
+        keys: list[str],
+        local_dir: str | Path = ".",
+        max_concurrency: Optional[int] = None,
+    ) -> list[Path]:
+        """
+        Скачивает несколько объектов конкурентно (не более max_concurrency одновременно).
+        Возвращает пути успешно скачанных файлов; ошибки логируются.
+        Если у ключей совпадают имена файлов — ValueError до начала скачивания.
+        """
+        _check_unique_names(keys)
+        max_concurrency = max_concurrency or self.max_concurrency
+        semaphore = asyncio.Semaphore(max_concurrency)
+        self.log.info("download_many: ключей=%s, max_concurrency=%s", len(keys), max_concurrency)
+
+        async def fetch(key: str) -> Path:
+            async with semaphore:
+                return await self.download_file(key, local_dir)
+
+        results = await asyncio.gather(*(fetch(key) for key in keys), return_exceptions=True)
+
+        downloaded = []
+        for key, result in zip(keys, results):
+            if isinstance(result, BaseException):
+                self.log.error("download_many ошибка: key=%s, error=%s", key, result)
+            else:
+                downloaded.append(result)
+        self.log.info("download_many: скачано=%s из %s", len(downloaded), len(keys))
+        return downloaded
@@ -30,8 +30,10 @@ def main():
     log.info("--- Список объектов ---")
     try:
         objects = client.list_objects(prefix="", max_keys=20)
-        for obj in objects:
-            log.info("  %s | %s bytes | %s", obj["Key"], obj["Size"], obj["LastModified"])
+        # Построчный вывод объектов — только в режиме DEBUG, иначе хватает общего количества
+        if log.isEnabledFor(logging.DEBUG):
+            for obj in objects:
+                log.debug("  %s | %s bytes | %s", obj.Key, obj.Size, obj.LastModified)
     except Exception as e:
         log.exception("Ошибка при получении списка: %s", e)
         return
@@ -40,7 +42,7 @@ def main():
     # key = "path/to/file.pdf"
     # client.download_file(key, local_dir=Path("./downloads"))
 
-    # 3) Скачать в память (bytes)
+    # 3) Скачать в память (bytearray)
     # data = client.download_file_to_buffer(key)
 
     # 4) Presigned URL для отдачи ссылки на скачивание
@@ -2,17 +2,29 @@
 Клиент для работы с AWS S3: получение файлов, список объектов, логирование.
 """
 
+import atexit
+import collections
+import functools
+import hashlib
+import itertools
 import logging
+import operator
 import os
+import socket
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed, wait
+from datetime import datetime
+from logging.handlers import MemoryHandler, RotatingFileHandler
 from pathlib import Path
-from typing import Optional
+from typing import BinaryIO, Iterator, NamedTuple, Optional
 
 import boto3
+from boto3.s3.transfer import TransferConfig
+from botocore.config import Config
 from botocore.exceptions import ClientError
 from dotenv import load_dotenv
 
-load_dotenv()
-
 # --- Настройка логирования ---
 
 LOG_DIR = Path(__file__).resolve().parent / "logs"
@@ -20,6 +32,58 @@ LOG_FILE = LOG_DIR / "s3_client.log"
 LOG_FORMAT = "%(asctime)s | %(levelname)-8s | %(name)s | %(message)s"
 DATE_FORMAT = "%Y-%m-%d %H:%M:%S"
 
+# --- Параметры многопоточного скачивания ---
+
+MULTIPART_THRESHOLD = 8 * 1024 * 1024  # 8 MB
+MULTIPART_CHUNKSIZE = 8 * 1024 * 1024  # 8 MB
+DEFAULT_MAX_CONCURRENCY = 16
+DEFAULT_MAX_WORKERS = 16
+DEFAULT_LIST_WORKERS = 32
+# Размер куска при чтении тела объекта в память
+READ_CHUNK_SIZE = 1024 * 1024
+
+# --- Параметры подключения ---
+
+DEFAULT_REGION = "ru-central1"
+ENV_VARS = ("AWS_REGION", "AWS_ACCESS_KEY_ID", "AWS_SECRET_ACCESS_KEY", "AWS_ENDPOINT_URL")
+
+# --- Параметры HTTP-клиента botocore ---
+
+# По умолчанию botocore держит 10 соединений — этого мало для параллельных загрузок
+DEFAULT_MAX_POOL_CONNECTIONS = 64
+CONNECT_TIMEOUT = 3
+READ_TIMEOUT = 30
+RETRIES = {"max_attempts": 5, "mode": "adaptive"}
+
+# Размер кэша подписанных presigned URL (на один экземпляр S3Client)
+PRESIGNED_CACHE_SIZE = 4096
+# Время жизни закэшированных метаданных объекта (head_object), секунды
+DEFAULT_METADATA_TTL = 5.0
+METADATA_CACHE_SIZE = 4096
+
+
+class FastRotatingFileHandler(RotatingFileHandler):
+    """
+    RotatingFileHandler, проверяющий размер файла раз в check_every записей,
+    а не на каждой (seek/tell на каждую запись заметно тормозит логирование).
+    Файл может превысить maxBytes не более чем на check_every записей.
+    """
+
+    def __init__(self, *args, check_every: int = 256, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._records = 0
+        self._check_every = check_every
+
+    def shouldRollover(self, record: logging.LogRecord) -> bool:
+        self._records += 1
+        if self._records % self._check_every:
+            return False
+        return super().shouldRollover(record)
+
+
+# Буферизующий хендлер, чей close() зарегистрирован в atexit (снимается при перенастройке)
+_atexit_handler: Optional[MemoryHandler] = None
+
 
 def setup_logging(
     level: int = logging.INFO,
@@ -27,24 +91,34 @@ def setup_logging(
     log_to_console: bool = True,
     max_bytes: int = 5 * 1024 * 1024,  # 5 MB
     backup_count: int = 3,
+    buffer_capacity: int = 512,
 ) -> logging.Logger:
     """
     Настраивает логгер для S3-клиента.
     Логи пишутся в файл (с ротацией) и/или в консоль.
+    Запись в файл буферизуется по buffer_capacity записей; буфер сбрасывается
+    сразу на ERROR и при завершении программы.
     """
     logger = logging.getLogger("s3_client")
     logger.setLevel(level)
 
-    # Убираем старые хендлеры при повторном вызове
+    # Убираем старые хендлеры при повторном вызове (буфер при этом сбрасывается в файл)
+    global _atexit_handler
+    if _atexit_handler is not None:
+        atexit.unregister(_atexit_handler.close)
+        _atexit_handler = None
+    for handler in logger.handlers:
+        target = getattr(handler, "target", None)
+        handler.close()
+        if target is not None:
+            target.close()
     logger.handlers.clear()
 
     formatter = logging.Formatter(LOG_FORMAT, datefmt=DATE_FORMAT)
 
     if log_to_file:
         LOG_DIR.mkdir(parents=True, exist_ok=True)
-        from logging.handlers import RotatingFileHandler
-
-        file_handler = RotatingFileHandler(
+        file_handler = FastRotatingFileHandler(
             LOG_FILE,
             maxBytes=max_bytes,
             backupCount=backup_count,
@@ -52,7 +126,16 @@ def setup_logging(
         )
         file_handler.setLevel(level)
         file_handler.setFormatter(formatter)
-        logger.addHandler(file_handler)
+        memory_handler = MemoryHandler(
+            buffer_capacity,
+            flushLevel=logging.ERROR,
+            target=file_handler,
+            flushOnClose=True,
+        )
+        memory_handler.setLevel(level)
+        atexit.register(memory_handler.close)
+        _atexit_handler = memory_handler
+        logger.addHandler(memory_handler)
 
     if log_to_console:
         console_handler = logging.StreamHandler()
@@ -74,8 +157,148 @@ def get_logger() -> logging.Logger:
     return _logger
 
 
+# --- Проверка ETag ---
+
+
+def _md5(data: memoryview):
+    return hashlib.md5(data, usedforsecurity=False)
+
+
+class ETagMismatchError(Exception):
+    """Скачанные данные не совпадают с ETag объекта."""
+
+
+def _parse_etag(etag: str) -> Optional[tuple[str, int]]:
+    """
+    Разбирает ETag на (MD5 в hex, число частей); 0 частей — обычный (не multipart) объект.
+    Возвращает None, если ETag не похож на MD5 и проверить по нему данные нельзя.
+    """
+    digest, sep, parts = etag.strip('"').partition("-")
+    if len(digest) != 32 or any(c not in "0123456789abcdef" for c in digest.lower()):
+        return None
+    if not sep:
+        return digest.lower(), 0
+    if not parts.isdigit() or int(parts) < 1:
+        return None
+    return digest.lower(), int(parts)
+
+
+def _multipart_md5(data: memoryview, part_size: int, parts: int) -> str:
+    """
+    MD5 multipart-объекта: MD5 от склеенных MD5 частей. Хэши считаются по срезам
+    memoryview, без копирования данных.
+    """
+    part_digests = b"".join(
+        _md5(data[i * part_size : (i + 1) * part_size]).digest() for i in range(parts)
+    )
+    return _md5(part_digests).hexdigest()
+
+
 # --- S3 клиент ---
 
+class S3Object(NamedTuple):
+    """Запись из списка объектов бакета. Компактнее словаря на больших листингах."""
+
+    Key: str
+    Size: int
+    LastModified: Optional[datetime]
+    ETag: Optional[str]
+
+
+_object_fields = operator.itemgetter("Key", "Size", "LastModified", "ETag")
+
+
+def _page_objects(contents: list[dict]) -> list[S3Object]:
+    """
+    Превращает Contents страницы ListObjectsV2 в список S3Object.
+    Основной путь — itemgetter + map (цикл целиком в C); если какого-то поля нет
+    (встречается у S3-совместимых хранилищ), страница разбирается с умолчаниями.
+    """
+    try:
+        return list(map(S3Object._make, map(_object_fields, contents)))
+    except KeyError:
+        return [
+            S3Object(obj["Key"], obj.get("Size", 0), obj.get("LastModified"), obj.get("ETag"))
+            for obj in contents
+        ]
+
+
+def _check_unique_names(keys: list[str]) -> None:
+    """
+    Файлы при пакетном скачивании называются по последнему сегменту ключа, поэтому
+    ключи с одинаковым именем (d1/x.txt и d2/x.txt) перезаписали бы друг друга.
+    """
+    names = collections.Counter(Path(key).name for key in keys)
+    duplicates = sorted(name for name, count in names.items() if count > 1)
+    if duplicates:
+        raise ValueError(f"Ключи с одинаковыми именами файлов: {', '.join(duplicates)}")
+
+
+@functools.cache
+def _env_defaults() -> dict[str, Optional[str]]:
+    """
+    Настройки подключения из окружения. Читаются один раз — при создании первого клиента,
+    так что .env, загруженный до этого (load_dotenv), учитывается.
+    """
+    return {name: os.environ.get(name) for name in ENV_VARS}
+
+
+# lru_cache не объединяет одновременные промахи, а boto3.Session не потокобезопасна:
+# сессии и клиенты создаются только под этой блокировкой
+_client_lock = threading.Lock()
+
+
+@functools.lru_cache(maxsize=16)
+def _cached_session(
+    region_name: str,
+    aws_access_key_id: Optional[str],
+    aws_secret_access_key: Optional[str],
+) -> boto3.Session:
+    """Одна boto3-сессия на набор учётных данных."""
+    session_kwargs = {"region_name": region_name}
+    if aws_access_key_id and aws_secret_access_key:
+        session_kwargs["aws_access_key_id"] = aws_access_key_id
+        session_kwargs["aws_secret_access_key"] = aws_secret_access_key
+    return boto3.Session(**session_kwargs)
+
+
+@functools.lru_cache(maxsize=16)
+def _cached_client(
+    region_name: str,
+    endpoint_url: Optional[str],
+    aws_access_key_id: Optional[str],
+    aws_secret_access_key: Optional[str],
+    max_pool_connections: int,
+    recv_buffer_size: Optional[int] = None,
+):
+    """
+    Создаёт boto3-клиент S3 (сессия + клиент — дорогая операция: загрузка моделей сервиса,
+    эндпоинтов и т.д.). Экземпляры S3Client с одинаковыми параметрами делят один клиент
+    и его пул соединений; low-level клиент boto3 потокобезопасен.
+    recv_buffer_size — размер SO_RCVBUF для соединений клиента (None — решает ОС).
+    """
+    session = _cached_session(region_name, aws_access_key_id, aws_secret_access_key)
+    client_kwargs = {}
+    if endpoint_url:
+        client_kwargs["endpoint_url"] = endpoint_url
+
+    config = Config(
+        max_pool_connections=max_pool_connections,
+        retries=RETRIES,
+        tcp_keepalive=True,
+        connect_timeout=CONNECT_TIMEOUT,
+        read_timeout=READ_TIMEOUT,
+    )
+    client = session.client("s3", config=config, **client_kwargs)
+    if recv_buffer_size:
+        # Публичного способа передать свои опции сокета в botocore нет. Список
+        # socket_options передаётся urllib3 по ссылке и применяется к каждому новому
+        # соединению; TCP_NODELAY и SO_KEEPALIVE botocore уже добавил сам.
+        client._endpoint.http_session._socket_options.append(
+            (socket.SOL_SOCKET, socket.SO_RCVBUF, recv_buffer_size)
+        )
+    return client
+
 
 class S3Client:
     """
@@ -90,63 +313,137 @@ class S3Client:
         aws_secret_access_key: Optional[str] = None,
         endpoint_url: Optional[str] = None,
         logger: Optional[logging.Logger] = None,
+        max_concurrency: int = DEFAULT_MAX_CONCURRENCY,
+        max_pool_connections: int = DEFAULT_MAX_POOL_CONNECTIONS,
+        recv_buffer_size: Optional[int] = None,
+        metadata_ttl: float = DEFAULT_METADATA_TTL,
     ):
         self.bucket = bucket
         self.log = logger or get_logger()
 
-        region_name = region_name or os.getenv("AWS_REGION", "ru-central1")
-        aws_access_key_id = aws_access_key_id or os.getenv("AWS_ACCESS_KEY_ID")
-        aws_secret_access_key = aws_secret_access_key or os.getenv("AWS_SECRET_ACCESS_KEY")
-        endpoint_url = endpoint_url or os.getenv("AWS_ENDPOINT_URL")
-
-        session_kwargs = {"region_name": region_name}
-        if aws_access_key_id and aws_secret_access_key:
-            session_kwargs["aws_access_key_id"] = aws_access_key_id
-            session_kwargs["aws_secret_access_key"] = aws_secret_access_key
-
-        self._session = boto3.Session(**session_kwargs)
-        client_kwargs = {}
-        if endpoint_url:
-            client_kwargs["endpoint_url"] = endpoint_url
-
-        self._client = self._session.client("s3", **client_kwargs)
+        env = _env_defaults()
+        region_name = region_name or env["AWS_REGION"] or DEFAULT_REGION
+        aws_access_key_id = aws_access_key_id or env["AWS_ACCESS_KEY_ID"]
+        aws_secret_access_key = aws_secret_access_key or env["AWS_SECRET_ACCESS_KEY"]
+        endpoint_url = endpoint_url or env["AWS_ENDPOINT_URL"]
+
+        # Пул соединений не должен быть меньше числа потоков скачивания
+        self._pool_size = max(max_pool_connections, max_concurrency)
+        with _client_lock:
+            self._client = _cached_client(
+                region_name,
+                endpoint_url,
+                aws_access_key_id,
+                aws_secret_access_key,
+                self._pool_size,
+                recv_buffer_size,
+            )
+        # Крупные объекты качаются параллельными byte-range GET запросами
+        self._transfer_config = TransferConfig(
+            multipart_threshold=MULTIPART_THRESHOLD,
+            multipart_chunksize=MULTIPART_CHUNKSIZE,
+            max_concurrency=max_concurrency,
+            use_threads=True,
+        )
+        # Кэш на уровне экземпляра, чтобы lru_cache не держал ссылку на self глобально
+        self._sign = functools.lru_cache(maxsize=PRESIGNED_CACHE_SIZE)(self._sign_url)
+        # key -> (время получения, метаданные); 0 отключает кэш
+        self._meta_ttl = metadata_ttl
+        self._meta_cache: dict[str, tuple[float, dict]] = {}
         self.log.info("S3 клиент инициализирован: bucket=%s, region=%s", bucket, region_name)
 
-    def list_objects(
+    def iter_objects(
         self,
         prefix: str = "",
-        max_keys: int = 1000,
+        page_size: int = 1000,
         delimiter: Optional[str] = None,
-    ) -> list[dict]:
+        max_items: Optional[int] = None,
+        as_dict: bool = False,
+    ) -> Iterator[S3Object | dict]:
         """
-        Список объектов в бакете (с опциональным префиксом).
-        Возвращает список словарей с ключами: Key, Size, LastModified, ETag.
+        Генератор объектов в бакете: записи отдаются по мере прихода страниц,
+        в памяти держится не больше одной страницы.
+        max_items — общий лимит записей; после него новые страницы не запрашиваются.
+        Каждая запись — S3Object (Key, Size, LastModified, ETag);
+        при as_dict=True — словарь с теми же ключами.
         """
-        self.log.debug("list_objects: prefix=%r, max_keys=%s", prefix, max_keys)
+        if self.log.isEnabledFor(logging.DEBUG):
+            self.log.debug(
+                "iter_objects: prefix=%r, page_size=%s, max_items=%s", prefix, page_size, max_items
+            )
+        pagination_config = {"PageSize": page_size}
+        if max_items is not None:
+            pagination_config["MaxItems"] = max_items
         try:
             paginator = self._client.get_paginator("list_objects_v2")
-            result = []
             for page in paginator.paginate(
                 Bucket=self.bucket,
                 Prefix=prefix,
-                MaxKeys=max_keys,
                 Delimiter=delimiter or "",
+                PaginationConfig=pagination_config,
             ):
-                for obj in page.get("Contents", []):
-                    result.append(
-                        {
-                            "Key": obj["Key"],
-                            "Size": obj.get("Size", 0),
-                            "LastModified": obj.get("LastModified"),
-                            "ETag": obj.get("ETag"),
-                        }
-                    )
-            self.log.info("list_objects: получено записей=%s (prefix=%r)", len(result), prefix)
-            return result
+                objects = _page_objects(page.get("Contents", ()))
+                if as_dict:
+                    yield from map(S3Object._asdict, objects)
+                else:
+                    yield from objects
         except ClientError as e:
-            self.log.exception("list_objects ошибка: %s", e)
+            self.log.exception("iter_objects ошибка: %s", e)
             raise
 
+    def list_objects(
+        self,
+        prefix: str = "",
+        max_keys: int = 1000,
+        delimiter: Optional[str] = None,
+        as_dict: bool = False,
+    ) -> list[S3Object | dict]:
+        """
+        Список объектов в бакете (с опциональным префиксом), не более max_keys записей.
+        Возвращает список S3Object (Key, Size, LastModified, ETag);
+        при as_dict=True — список словарей с теми же ключами.
+        """
+        if self.log.isEnabledFor(logging.DEBUG):
+            self.log.debug("list_objects: prefix=%r, max_keys=%s", prefix, max_keys)
+        result = list(
+            self.iter_objects(
+                prefix=prefix,
+                page_size=min(max_keys, 1000),
+                delimiter=delimiter,
+                max_items=max_keys,
+                as_dict=as_dict,
+            )
+        )
+        self.log.info("list_objects: получено записей=%s (prefix=%r)", len(result), prefix)
+        return result
+
+    def list_objects_parallel(
+        self,
+        prefixes: list[str],
+        workers: int = DEFAULT_LIST_WORKERS,
+        as_dict: bool = False,
+    ) -> list[S3Object | dict]:
+        """
+        Полный список объектов по нескольким префиксам: каждый префикс
+        листается в своём потоке, результаты объединяются в порядке готовности.
+        """
+        if self.log.isEnabledFor(logging.DEBUG):
+            self.log.debug(
+                "list_objects_parallel: префиксов=%s, workers=%s", len(prefixes), workers
+            )
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            futures = [
+                executor.submit(list, self.iter_objects(prefix=prefix, as_dict=as_dict))
+                for prefix in prefixes
+            ]
+            result = list(
+                itertools.chain.from_iterable(future.result() for future in as_completed(futures))
+            )
+        self.log.info(
+            "list_objects_parallel: получено записей=%s (префиксов=%s)", len(result), len(prefixes)
+        )
+        return result
+
     def download_file(
         self,
         key: str,
@@ -157,59 +454,310 @@ class S3Client:
         Скачивает объект из S3 в локальный файл.
         local_path — полный путь к файлу; если не задан, используется local_dir + имя ключа.
         """
-        local_path = Path(local_path) if local_path else None
-        local_dir = Path(local_dir) if local_dir else Path(".")
+        return self._download_file(key, local_path, local_dir, self._transfer_config)
 
-        if local_path is None:
-            local_path = local_dir / Path(key).name
+    def _download_file(
+        self,
+        key: str,
+        local_path: Optional[str | Path],
+        local_dir: Optional[str | Path],
+        transfer_config: TransferConfig,
+    ) -> Path:
+        """download_file с явным TransferConfig (download_many урезает число потоков на файл)."""
+        log = self.log
+        if local_path:
+            local_path = Path(local_path)
+        else:
+            local_path = (Path(local_dir) if local_dir else Path(".")) / Path(key).name
 
         local_path.parent.mkdir(parents=True, exist_ok=True)
-        self.log.info("download_file: key=%s -> %s", key, local_path)
+        log.info("download_file: key=%s -> %s", key, local_path)
 
+        # Пишем во временный .part и атомарно переименовываем: по целевому пути
+        # никогда не лежит недокачанный файл
+        tmp_path = local_path.with_name(local_path.name + ".part")
         try:
-            self._client.download_file(self.bucket, key, str(local_path))
+            self._client.download_file(
+                self.bucket, key, str(tmp_path), Config=transfer_config
+            )
+            os.replace(tmp_path, local_path)
+            # Скачали актуальную версию — кэш метаданных по ключу мог устареть
+            self.invalidate(key)
             size = local_path.stat().st_size
-            self.log.info("download_file: успешно, размер=%s bytes", size)
+            log.info("download_file: успешно, размер=%s bytes", size)
             return local_path
         except ClientError as e:
-            self.log.exception("download_file ошибка: key=%s, error=%s", key, e)
+            log.exception("download_file ошибка: key=%s, error=%s", key, e)
             raise
+        finally:
+            tmp_path.unlink(missing_ok=True)
 
-    def download_file_to_buffer(self, key: str) -> bytes:
-        """Скачивает объект в память и возвращает bytes."""
-        self.log.debug("download_file_to_buffer: key=%s", key)
+    def download_many(
+        self,
+        keys: list[str],
+        local_dir: str | Path = ".",
+        max_workers: int = DEFAULT_MAX_WORKERS,
+    ) -> list[Path]:
+        """
+        Скачивает несколько объектов параллельно в local_dir.
+        Все потоки используют один boto3-клиент (он потокобезопасен) и его пул соединений.
+        max_workers ограничивается размером пула, а число потоков на один файл
+        подбирается так, чтобы max_workers * потоки_на_файл не превышало пул.
+        Возвращает пути успешно скачанных файлов; ошибки логируются.
+        Если у ключей совпадают имена файлов — ValueError до начала скачивания.
+        """
+        _check_unique_names(keys)
+        local_dir = Path(local_dir)
+        if max_workers > self._pool_size:
+            self.log.warning(
+                "download_many: max_workers=%s больше пула соединений (%s), уменьшено до %s",
+                max_workers,
+                self._pool_size,
+                self._pool_size,
+            )
+            max_workers = self._pool_size
+        # Потоков на файл столько, чтобы все ranged GET разом помещались в пул
+        per_file = max(
+            1, min(self._transfer_config.max_concurrency, self._pool_size // max_workers)
+        )
+        transfer_config = TransferConfig(
+            multipart_threshold=MULTIPART_THRESHOLD,
+            multipart_chunksize=MULTIPART_CHUNKSIZE,
+            max_concurrency=per_file,
+            use_threads=True,
+        )
+        self.log.info(
+            "download_many: ключей=%s, max_workers=%s, потоков на файл=%s",
+            len(keys),
+            max_workers,
+            per_file,
+        )
+
+        result = []
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            futures = {
+                executor.submit(self._download_file, key, None, local_dir, transfer_config): key
+                for key in keys
+            }
+            for future in as_completed(futures):
+                key = futures[future]
+                try:
+                    result.append(future.result())
+                except ClientError as e:
+                    # Трейсбек ClientError уже записан в download_file
+                    self.log.error("download_many ошибка: key=%s, error=%s", key, e)
+                except Exception as e:
+                    self.log.exception("download_many ошибка: key=%s, error=%s", key, e)
+
+        self.log.info("download_many: скачано=%s из %s", len(result), len(keys))
+        return result
+
+    def download_file_to_buffer(
+        self,
+        key: str,
+        hedge_delay: Optional[float] = None,
+        verify: bool = False,
+    ) -> bytes | bytearray:
+        """
+        Скачивает объект в память. Возвращает bytearray, заполненный без промежуточных
+        копий (bytes — если сервер не прислал ContentLength). Чтобы писать сразу в файл
+        или свой буфер, используйте download_file_to_writable.
+        hedge_delay — если задан (в секундах) и запрос не завершился за это время,
+        отправляется повторный GET, используется тот ответ, что придёт первым.
+        verify — сверить данные с ETag (MD5 или MD5 частей для multipart-объектов);
+        при расхождении — ETagMismatchError. Если ETag проверить нельзя, пишется
+        предупреждение. Для объектов с SSE-KMS/SSE-C ETag не является MD5 — не подходит.
+        """
+        if self.log.isEnabledFor(logging.DEBUG):
+            self.log.debug("download_file_to_buffer: key=%s, hedge_delay=%s", key, hedge_delay)
         try:
-            response = self._client.get_object(Bucket=self.bucket, Key=key)
-            data = response["Body"].read()
+            if hedge_delay is None:
+                data = self._fetch_object(key, verify)
+            else:
+                data = self._fetch_object_hedged(key, hedge_delay, verify)
             self.log.info("download_file_to_buffer: key=%s, размер=%s bytes", key, len(data))
             return data
         except ClientError as e:
             self.log.exception("download_file_to_buffer ошибка: key=%s, error=%s", key, e)
             raise
 
+    def download_file_to_writable(self, key: str, fileobj: BinaryIO) -> int:
+        """
+        Скачивает объект в переданный файловый объект (BytesIO, открытый файл)
+        без промежуточной копии в памяти. Возвращает число записанных байт.
+        """
+        if self.log.isEnabledFor(logging.DEBUG):
+            self.log.debug("download_file_to_writable: key=%s", key)
+        try:
+            # Части пишутся не по порядку, поэтому размер считаем по колбэку, а не по tell()
+            received = []
+            self._client.download_fileobj(
+                self.bucket, key, fileobj, Callback=received.append, Config=self._transfer_config
+            )
+            size = sum(received)
+            self.log.info("download_file_to_writable: key=%s, размер=%s bytes", key, size)
+            return size
+        except ClientError as e:
+            self.log.exception("download_file_to_writable ошибка: key=%s, error=%s", key, e)
+            raise
+
+    def _fetch_object(
+        self,
+        key: str,
+        verify: bool = False,
+        cancel: Optional[threading.Event] = None,
+    ) -> bytes | bytearray:
+        """
+        Один GET запрос объекта. Тело читается через readinto в заранее выделенный
+        по ContentLength буфер, который и возвращается — без копирования в bytes.
+        cancel — если событие установлено, чтение прерывается, соединение закрывается
+        и возвращается b"" (используется для проигравшего hedged-запроса).
+        """
+        response = self._client.get_object(Bucket=self.bucket, Key=key)
+        body = response["Body"]
+        if cancel is not None and cancel.is_set():
+            body.close()
+            return b""
+        length = response.get("ContentLength")
+        if length is None:
+            data = body.read()
+            if verify:
+                self._verify_etag(key, memoryview(data), response.get("ETag"))
+            return data
+
+        buf = bytearray(length)
+        view = memoryview(buf)
+        offset = 0
+        while offset < length:
+            # Читаем кусками, чтобы между ними можно было проверить отмену
+            if cancel is not None and cancel.is_set():
+                body.close()
+                return b""
+            read = body.readinto(view[offset : offset + READ_CHUNK_SIZE])
+            if not read:
+                break
+            offset += read
+        if verify:
+            self._verify_etag(key, view[:offset], response.get("ETag"))
+        view.release()
+        return buf
+
+    def _verify_etag(self, key: str, data: memoryview, etag: Optional[str]) -> None:
+        """
+        Сверяет скачанные данные с ETag. При расхождении — ETagMismatchError; если проверить
+        нельзя (ETag не MD5, нет данных о частях) — только предупреждение в лог.
+        Размер частей multipart-объекта в ETag не хранится, его даёт head_object(PartNumber=1).
+        """
+        parsed = _parse_etag(etag) if etag else None
+        if parsed is None:
+            self.log.warning(
+                "download_file_to_buffer: ETag не проверить, key=%s, etag=%s", key, etag
+            )
+            return
+
+        digest, parts = parsed
+        if parts == 0:
+            actual = _md5(data).hexdigest()
+        else:
+            try:
+                # IfMatch — чтобы размер части взять у той же версии объекта
+                head = self._client.head_object(
+                    Bucket=self.bucket, Key=key, PartNumber=1, IfMatch=etag
+                )
+            except ClientError as e:
+                self.log.warning(
+                    "download_file_to_buffer: ETag не проверить, key=%s, error=%s", key, e
+                )
+                return
+            part_size = head.get("ContentLength")
+            # Части разного размера (кроме последней) по первой части не восстановить
+            if (
+                not part_size
+                or head.get("PartsCount") != parts
+                or -(-len(data) // part_size) != parts
+            ):
+                self.log.warning(
+                    "download_file_to_buffer: ETag не проверить, key=%s, part_size=%s, parts=%s",
+                    key,
+                    part_size,
+                    head.get("PartsCount"),
+                )
+                return
+            actual = _multipart_md5(data, part_size, parts)
+
+        if actual != digest:
+            self.log.error("download_file_to_buffer: ETag не совпал, key=%s, etag=%s", key, etag)
+            raise ETagMismatchError(f"Данные объекта {key!r} не соответствуют ETag {etag}")
+
+    def _fetch_object_hedged(
+        self, key: str, delay: float, verify: bool = False
+    ) -> bytes | bytearray:
+        """
+        GET с «подстраховкой»: если первый запрос не уложился в delay секунд,
+        параллельно отправляется второй. Безопасно, т.к. GET идемпотентен.
+        """
+        executor = ThreadPoolExecutor(max_workers=2)
+        cancel = threading.Event()
+        try:
+            futures = [executor.submit(self._fetch_object, key, verify, cancel)]
+            done, _ = wait(futures, timeout=delay)
+            if not done:
+                if self.log.isEnabledFor(logging.DEBUG):
+                    self.log.debug("download_file_to_buffer: повторный запрос для key=%s", key)
+                futures.append(executor.submit(self._fetch_object, key, verify, cancel))
+
+            error = None
+            for future in as_completed(futures):
+                try:
+                    return future.result()
+                except Exception as e:
+                    error = e
+            raise error
+        finally:
+            # Проигравший запрос прерывает чтение тела и закрывает соединение; не ждём его
+            cancel.set()
+            executor.shutdown(wait=False, cancel_futures=True)
+
     def get_presigned_url(
         self,
         key: str,
         expiration: int = 3600,
         method: str = "get_object",
     ) -> str:
-        """Генерирует presigned URL для скачивания (по умолчанию на 1 час)."""
-        self.log.debug("get_presigned_url: key=%s, expiration=%s", key, expiration)
+        """
+        Генерирует presigned URL для скачивания (по умолчанию на 1 час).
+        Подпись кэшируется на окно expiration / 2: в пределах окна возвращается тот же URL,
+        и он остаётся действительным ещё минимум половину срока.
+        """
+        if self.log.isEnabledFor(logging.DEBUG):
+            self.log.debug("get_presigned_url: key=%s, expiration=%s", key, expiration)
         try:
-            url = self._client.generate_presigned_url(
-                method,
-                Params={"Bucket": self.bucket, "Key": key},
-                ExpiresIn=expiration,
-            )
+            window = int(time.time()) // max(1, expiration // 2)
+            url = self._sign(method, key, window, expiration)
             self.log.info("get_presigned_url: сгенерирован для key=%s", key)
             return url
         except ClientError as e:
             self.log.exception("get_presigned_url ошибка: key=%s, error=%s", key, e)
             raise
 
+    def _sign_url(self, method: str, key: str, window: int, expiration: int) -> str:
+        """Подписывает URL; window участвует только в ключе кэша."""
+        return self._client.generate_presigned_url(
+            method,
+            Params={"Bucket": self.bucket, "Key": key},
+            ExpiresIn=expiration,
+        )
+
     def get_object_metadata(self, key: str) -> dict:
-        """Возвращает метаданные объекта (ContentLength, LastModified, ContentType и т.д.)."""
-        self.log.debug("get_object_metadata: key=%s", key)
+        """
+        Возвращает метаданные объекта (ContentLength, LastModified, ContentType и т.д.).
+        Повторные запросы того же ключа в пределах metadata_ttl отдаются из кэша.
+        """
+        if self.log.isEnabledFor(logging.DEBUG):
+            self.log.debug("get_object_metadata: key=%s", key)
+        cached = self._meta_cache.get(key)
+        if cached is not None and time.monotonic() - cached[0] < self._meta_ttl:
+            return dict(cached[1])
         try:
             response = self._client.head_object(Bucket=self.bucket, Key=key)
             meta = {
@@ -219,15 +767,25 @@ class S3Client:
                 "ETag": response.get("ETag"),
             }
             self.log.info("get_object_metadata: key=%s, size=%s", key, meta.get("ContentLength"))
-            return meta
+            if self._meta_ttl > 0:
+                # Грубое ограничение размера: записи живут секунды, проще сбросить всё
+                if len(self._meta_cache) >= METADATA_CACHE_SIZE:
+                    self._meta_cache.clear()
+                self._meta_cache[key] = (time.monotonic(), meta)
+            return dict(meta)
         except ClientError as e:
             self.log.exception("get_object_metadata ошибка: key=%s, error=%s", key, e)
             raise
 
+    def invalidate(self, key: str) -> None:
+        """Сбрасывает закэшированные метаданные ключа."""
+        self._meta_cache.pop(key, None)
+
 
 # --- Точка входа для быстрого теста ---
 
 if __name__ == "__main__":
+    load_dotenv()
     setup_logging(level=logging.DEBUG)
     log = get_logger()
 
@@ -240,6 +798,6 @@ if __name__ == "__main__":
             objects = client.list_objects(prefix="", max_keys=10)
             log.info("Найдено объектов: %s", len(objects))
             for obj in objects[:5]:
-                log.info("  %s (%s bytes)", obj["Key"], obj["Size"])
+                log.info("  %s (%s bytes)", obj.Key, obj.Size)
         except Exception as e:
             log.exception("Ошибка: %s", e)